@@ -1,2 +1,23 @@
 #!/bin/bash
-curl --proto '=https' --tlsv1.2 'https://www.unicode.org/Public/UCD/latest/ucd/UnicodeData.txt' > utfdump_bin/unicode_data_latest.txt
+out_path='utfdump_bin/unicode_data_latest.txt'
+tmp_path="$out_path.tmp"
+url='https://www.unicode.org/Public/UCD/latest/ucd/UnicodeData.txt'
+
+# Only download the file if it has changed since our local copy was downloaded.
+time_cond=()
+if [ -e "$out_path" ]; then
+    time_cond=(-z "$out_path")
+fi
+
+# Download to a temporary file, so that a failed download never replaces our local copy.
+rm -f "$tmp_path"
+if curl --proto '=https' --tlsv1.2 --compressed --fail "${time_cond[@]}" -o "$tmp_path" "$url"; then
+    # curl doesn't write anything if our local copy is already up to date.
+    if [ -e "$tmp_path" ]; then
+        mv "$tmp_path" "$out_path"
+    fi
+else
+    status=$?
+    rm -f "$tmp_path"
+    exit "$status"
+fi
@@ -1,4 +1,4 @@
-use std::{env, fs::File, io::{BufReader, BufRead, Write}, path::Path};
+use std::{env, fs::{self, File}, io::Write, path::Path};
 
 use utfdump_core::{chardata::CharData, encoded::DataBuf};
 
@@ -11,24 +11,26 @@ fn main() {
     let out_dir = env::var_os("OUT_DIR").unwrap();
     let out_path = Path::new(&out_dir).join(OUT_DATA_PATH);
 
-    let data_file = File::open(UNICODE_DATA_PATH)
-        .expect("failed to open unicode data file");
+    // Read the whole file up front so that each row can be parsed as a borrowed slice, rather than
+    // allocating a new `String` for every line.
+    let unicode_data = fs::read_to_string(UNICODE_DATA_PATH)
+        .expect("failed to read unicode data file");
 
-    let buf_reader = BufReader::new(data_file);
- 
-    let mut data = DataBuf::new();
-    let mut start_codepoint = None;
+    // The input's length bounds the string table's size.
+    let mut data = DataBuf::with_capacity(char::MAX as usize + 1, unicode_data.len());
+    let mut block_start: Option<(u32, &str)> = None;
 
-    for line in buf_reader.lines() {
-        let line = line.unwrap();
-        let (codepoint, char_data) = CharData::from_row(&line).unwrap();
+    for line in unicode_data.lines() {
+        let (codepoint, char_data) = CharData::from_row(line).unwrap();
         
-        match start_codepoint {
-            Some(start_codepoint_inner) => {
-                let prefix = char_data.name()
+        match block_start {
+            Some((start_codepoint, prefix)) => {
+                let last_prefix = char_data.name()
                     .strip_suffix(", Last>")
                     .expect("expected end of codepoint block");
 
+                assert_eq!(last_prefix, prefix, "mismatched codepoint block names");
+
                 let name = {
                     let mut buf = String::with_capacity(prefix.len() + 1);
                     buf.push_str(prefix);
@@ -38,34 +40,33 @@ fn main() {
 
                 let char_data = char_data.with_name(&name);
 
-                data.insert(char_data, start_codepoint_inner..(codepoint + 1))
+                data.insert(char_data, start_codepoint..(codepoint + 1))
                     .unwrap();
 
-                start_codepoint = None;
+                block_start = None;
             },
 
             None => {
-                if char_data.name().ends_with(", First>") {
-                    start_codepoint = Some(codepoint);
-                } else {
-                    data.insert(char_data, codepoint..(codepoint + 1))
-                        .unwrap();
+                match char_data.name().strip_suffix(", First>") {
+                    Some(prefix) => {
+                        block_start = Some((codepoint, prefix));
+                    },
+                    None => {
+                        data.insert(char_data, codepoint..(codepoint + 1))
+                            .unwrap();
+                    },
                 }
             },
         }
     }
 
-    let (strings_len, [strings, data]) = data
-        .as_ref_type()
-        .to_bytes()
-        .unwrap();
+    let encoded = data.to_bytes().unwrap();
 
     let mut out_file = File::create(&out_path)
         .expect("failed to open output file");
 
-    out_file.write_all(&strings_len).unwrap();
-    out_file.write_all(strings).unwrap();
-    out_file.write_all(data).unwrap();
-
-    drop(out_file);
+    out_file.write_all(&encoded.strings_len).unwrap();
+    out_file.write_all(encoded.strings).unwrap();
+    out_file.write_all(&encoded.page_index).unwrap();
+    out_file.write_all(&encoded.pages).unwrap();
 }
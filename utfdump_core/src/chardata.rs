@@ -9,19 +9,18 @@ pub struct CharData<'a> {
 
 impl<'a> CharData<'a> {
     pub fn from_row(row: &'a str) -> Option<(u32, Self)> {
-        let mut fields = [""; 15];
-        for (i, field) in row.splitn(15, ';').enumerate() {
-            fields[i] = field;
-        }
+        // Only the first four fields are used, so split lazily rather than splitting the whole row.
+        let mut fields = row.split(';');
 
-        let codepoint = u32::from_str_radix(fields[0], 16).ok()?;
-        let name = fields[1];
-        let category = Category::from_abbr(fields[2])?;
-        let ccc = CombiningClass(u8::from_str_radix(fields[3], 10).ok()?);
+        let codepoint = u32::from_str_radix(fields.next()?, 16).ok()?;
+        let name = fields.next()?;
+        let category = Category::from_abbr(fields.next()?)?;
+        let ccc = CombiningClass(u8::from_str_radix(fields.next()?, 10).ok()?);
 
         Some((codepoint, Self::from_parts(name, category, ccc)))
     }
 
+    #[inline]
     pub fn from_parts(name: &'a str, category: Category, ccc: CombiningClass) -> Self {
         Self { name, category, ccc }
     }
@@ -33,14 +32,17 @@ impl<'a> CharData<'a> {
         Self { name, ..self }
     }
 
+    #[inline]
     pub fn name(&self) -> &'a str {
         self.name
     }
 
+    #[inline]
     pub fn category(&self) -> Category {
         self.category
     }
 
+    #[inline]
     pub fn ccc(&self) -> CombiningClass {
         self.ccc
     }
@@ -82,6 +84,7 @@ pub enum Category {
 }
 
 impl Category {
+    #[inline]
     pub fn from_byte(b: u8) -> Option<Self> {
         match b {
             0 => Some(Self::Lu),
@@ -123,41 +126,44 @@ impl Category {
     }
 
     pub fn from_abbr(s: &str) -> Option<Self> {
-        match s {
-            "Lu" => Some(Self::Lu),
-            "Ll" => Some(Self::Ll),
-            "Lt" => Some(Self::Lt),
-            "Mn" => Some(Self::Mn),
-            "Mc" => Some(Self::Mc),
-            "Me" => Some(Self::Me),
-            "Nd" => Some(Self::Nd),
-            "Nl" => Some(Self::Nl),
-            "No" => Some(Self::No),
-            "Zs" => Some(Self::Zs),
-            "Zl" => Some(Self::Zl),
-            "Zp" => Some(Self::Zp),
-            "Cc" => Some(Self::Cc),
-            "Cf" => Some(Self::Cf),
-            "Cs" => Some(Self::Cs),
-            "Co" => Some(Self::Co),
-            "Cn" => Some(Self::Cn),
-            "Lm" => Some(Self::Lm),
-            "Lo" => Some(Self::Lo),
-            "Pc" => Some(Self::Pc),
-            "Pd" => Some(Self::Pd),
-            "Ps" => Some(Self::Ps),
-            "Pe" => Some(Self::Pe),
-            "Pi" => Some(Self::Pi),
-            "Pf" => Some(Self::Pf),
-            "Po" => Some(Self::Po),
-            "Sm" => Some(Self::Sm),
-            "Sc" => Some(Self::Sc),
-            "Sk" => Some(Self::Sk),
-            "So" => Some(Self::So),
+        // Matching on the bytes lets the compiler branch on each character in turn, rather than
+        // comparing the whole string against every abbreviation.
+        match s.as_bytes() {
+            [b'L', b'u'] => Some(Self::Lu),
+            [b'L', b'l'] => Some(Self::Ll),
+            [b'L', b't'] => Some(Self::Lt),
+            [b'M', b'n'] => Some(Self::Mn),
+            [b'M', b'c'] => Some(Self::Mc),
+            [b'M', b'e'] => Some(Self::Me),
+            [b'N', b'd'] => Some(Self::Nd),
+            [b'N', b'l'] => Some(Self::Nl),
+            [b'N', b'o'] => Some(Self::No),
+            [b'Z', b's'] => Some(Self::Zs),
+            [b'Z', b'l'] => Some(Self::Zl),
+            [b'Z', b'p'] => Some(Self::Zp),
+            [b'C', b'c'] => Some(Self::Cc),
+            [b'C', b'f'] => Some(Self::Cf),
+            [b'C', b's'] => Some(Self::Cs),
+            [b'C', b'o'] => Some(Self::Co),
+            [b'C', b'n'] => Some(Self::Cn),
+            [b'L', b'm'] => Some(Self::Lm),
+            [b'L', b'o'] => Some(Self::Lo),
+            [b'P', b'c'] => Some(Self::Pc),
+            [b'P', b'd'] => Some(Self::Pd),
+            [b'P', b's'] => Some(Self::Ps),
+            [b'P', b'e'] => Some(Self::Pe),
+            [b'P', b'i'] => Some(Self::Pi),
+            [b'P', b'f'] => Some(Self::Pf),
+            [b'P', b'o'] => Some(Self::Po),
+            [b'S', b'm'] => Some(Self::Sm),
+            [b'S', b'c'] => Some(Self::Sc),
+            [b'S', b'k'] => Some(Self::Sk),
+            [b'S', b'o'] => Some(Self::So),
             _ => None,
         }
     }
 
+    #[inline]
     pub fn abbr(self) -> &'static str {
         match self {
             Self::Lu => "Lu",
@@ -193,6 +199,7 @@ impl Category {
         }
     }
 
+    #[inline]
     pub fn full_name(self) -> &'static str {
         match self {
             Self::Lu => "Letter, Uppercase",
@@ -206,7 +213,7 @@ impl Category {
             Self::No => "Number, Other",
             Self::Zs => "Separator, Space",
             Self::Zl => "Separator, Line",
-            Self::Zp => "Separator: Paragraph",
+            Self::Zp => "Separator, Paragraph",
             Self::Cc => "Other, Control",
             Self::Cf => "Other, Format",
             Self::Cs => "Other, Surrogate",
@@ -266,6 +273,7 @@ impl CombiningClass {
         }
     }
 
+    #[inline]
     pub fn is_combining(self) -> bool {
         self.0 != 0
     }
@@ -1,41 +1,43 @@
-use std::{collections::{HashMap, hash_map}, error, fmt, str, ops::Range};
+use std::{collections::{HashMap, hash_map}, error, fmt, iter, str, ops::Range};
 
 use crate::chardata::{CharData, Category, CombiningClass};
 
-const DATA_ENTRY_SIZE: usize = 8;
+const DATA_ENTRY_SIZE: usize = 6;
 
-const DATA_INIT_FLAG: u8 = 1;
-const DATA_REPEATED_FLAG: u8 = 2;
-
-fn encode_char_data(name_index: u32, category: Category, ccc: CombiningClass, repeated: bool) -> [u8; DATA_ENTRY_SIZE] {
-    let mut buf = [0u8; DATA_ENTRY_SIZE];
+// Name indices are stored in 3 bytes, little-endian.
+const MAX_NAME_INDEX: u32 = 0xff_ff_ff;
 
-    buf[0] |= DATA_INIT_FLAG;
+// The data table is split into pages of `PAGE_LEN` consecutive codepoints. Identical pages (such as
+// pages of unassigned codepoints, or pages within a large range like the CJK ideographs) are only
+// stored once, and the page index maps each page number to a 2-byte little-endian page id.
+const PAGE_BITS: u32 = 8;
+const PAGE_LEN: usize = 1 << PAGE_BITS;
+const PAGE_SIZE: usize = PAGE_LEN * DATA_ENTRY_SIZE;
+const PAGE_COUNT: usize = (char::MAX as usize + 1) >> PAGE_BITS;
+const PAGE_INDEX_ENTRY_SIZE: usize = 2;
+const PAGE_INDEX_SIZE: usize = PAGE_COUNT * PAGE_INDEX_ENTRY_SIZE;
 
-    if repeated {
-        buf[0] |= DATA_REPEATED_FLAG;
-    }
+const DATA_INIT_FLAG: u8 = 1;
 
-    buf[1..5].copy_from_slice(&name_index.to_le_bytes());
-    buf[5] = category.byte_repr();
-    buf[6] = ccc.0;
+fn encode_char_data(name_index: u32, category: Category, ccc: CombiningClass) -> [u8; DATA_ENTRY_SIZE] {
+    let [i0, i1, i2, _] = name_index.to_le_bytes();
 
-    buf
+    [DATA_INIT_FLAG, i0, i1, i2, category.byte_repr(), ccc.0]
 }
 
-fn decode_char_data(bytes: [u8; DATA_ENTRY_SIZE]) -> Option<(u32, Category, CombiningClass, bool)> {
-    let flags = bytes[0];
+#[inline]
+fn decode_char_data(bytes: [u8; DATA_ENTRY_SIZE]) -> Option<(u32, Category, CombiningClass)> {
+    let [flags, i0, i1, i2, category, ccc] = bytes;
     
     if flags & DATA_INIT_FLAG == 0 {
         return None;
     }
 
-    let name_index = u32::from_le_bytes(bytes[1..5].try_into().unwrap());
-    let category = Category::from_byte(bytes[5])?;
-    let ccc = CombiningClass(bytes[6]);
-    let repeated = flags & DATA_REPEATED_FLAG != 0;
+    let name_index = u32::from_le_bytes([i0, i1, i2, 0]);
+    let category = Category::from_byte(category)?;
+    let ccc = CombiningClass(ccc);
 
-    Some((name_index, category, ccc, repeated))
+    Some((name_index, category, ccc))
 }
 
 pub struct DataBuf {
@@ -53,8 +55,12 @@ impl DataBuf {
         }
     }
 
-    pub fn as_ref_type(&self) -> Data {
-        Data { data: &self.data, strings: self.strings.as_ref_type() }
+    pub fn with_capacity(num_codepoints: usize, strings_capacity: usize) -> Self {
+        Self {
+            data: Vec::with_capacity(num_codepoints.saturating_mul(DATA_ENTRY_SIZE)),
+            strings: StringTableBuf::with_capacity(strings_capacity),
+            strings_map: HashMap::new(),
+        }
     }
 
     pub fn insert(&mut self, char_data: CharData, range: Range<u32>) -> Result<(), DataBufError> {
@@ -62,8 +68,6 @@ impl DataBuf {
             return Ok(());
         }
 
-        let repeated = range.end - range.start > 1;
-
         let range = {
             let start = usize::try_from(range.start)
                 .map_err(|_| DataBufError::DataOutOfCapacity)?
@@ -81,13 +85,12 @@ impl DataBuf {
                 .map_err(|_| DataBufError::DataOutOfCapacity)?;
         }
 
-        let name_index = self.add_string(char_data.name().to_owned())?;
+        let name_index = self.add_string(char_data.name())?;
 
         let encoded_char_data = encode_char_data(
             name_index,
             char_data.category(),
-            char_data.ccc(),
-            repeated
+            char_data.ccc()
         );
 
         if self.data.len() < range.end {
@@ -95,57 +98,118 @@ impl DataBuf {
             self.data.resize(range.end, 0);
         }
 
-        for i in range.step_by(DATA_ENTRY_SIZE) {
-            self.data[i..(i + DATA_ENTRY_SIZE)].copy_from_slice(&encoded_char_data);
+        for entry in self.data[range].chunks_exact_mut(DATA_ENTRY_SIZE) {
+            entry.copy_from_slice(&encoded_char_data);
         }
 
         Ok(())
     }
 
-    fn add_string(&mut self, name: String) -> Result<u32, DataBufError> {
-        match self.strings_map.entry(name) {
-            hash_map::Entry::Occupied(entry) => Ok(*entry.get()),
-            hash_map::Entry::Vacant(entry) => {
-                let index = self.strings.push(entry.key())?;
-                entry.insert(index);
-                Ok(index)
-            },
+    fn add_string(&mut self, name: &str) -> Result<u32, DataBufError> {
+        // Look the string up by reference first, so that we only allocate an owned copy of it
+        // when it is not already in the table.
+        if let Some(&index) = self.strings_map.get(name) {
+            return Ok(index);
         }
+
+        let index = self.strings.push(name)?;
+        self.strings_map.insert(name.to_owned(), index);
+        Ok(index)
     }
+
+    /// Encodes the data into the format read by `Data::from_bytes`. The parts are returned
+    /// separately, so that they can be written out without first copying them into one buffer.
+    pub fn to_bytes(&self) -> Result<EncodedParts<'_>, DataBufError> {
+        if self.data.len() > PAGE_COUNT * PAGE_SIZE {
+            return Err(DataBufError::DataOutOfCapacity);
+        }
+
+        let strings = self.strings.as_ref_type().to_bytes();
+        let strings_len = u32::try_from(strings.len())
+            .map_err(|_| StringTableBufError::OutOfCapacity)?
+            .to_le_bytes();
+
+        let full_pages = self.data.chunks_exact(PAGE_SIZE);
+
+        let last_page = {
+            let mut buf = full_pages.remainder().to_vec();
+            buf.resize(PAGE_SIZE, 0);
+            buf
+        };
+
+        let empty_page = [0u8; PAGE_SIZE];
+
+        let all_pages = full_pages
+            .chain(iter::once(&*last_page))
+            .chain(iter::repeat(&empty_page[..]))
+            .take(PAGE_COUNT);
+
+        let mut page_ids = HashMap::<&[u8], u16>::new();
+        let mut page_index = Vec::with_capacity(PAGE_INDEX_SIZE);
+        let mut pages = Vec::new();
+
+        for page in all_pages {
+            let page_id = match page_ids.entry(page) {
+                hash_map::Entry::Occupied(entry) => *entry.get(),
+                hash_map::Entry::Vacant(entry) => {
+                    let page_id = u16::try_from(pages.len() / PAGE_SIZE)
+                        .map_err(|_| DataBufError::DataOutOfCapacity)?;
+                    pages.extend_from_slice(page);
+                    *entry.insert(page_id)
+                },
+            };
+
+            page_index.extend_from_slice(&page_id.to_le_bytes());
+        }
+
+        Ok(EncodedParts { strings_len, strings, page_index, pages })
+    }
+}
+
+/// The parts of an encoded `DataBuf`, which should be written out in the order of the fields.
+pub struct EncodedParts<'a> {
+    pub strings_len: [u8; 4],
+    pub strings: &'a [u8],
+    pub page_index: Vec<u8>,
+    pub pages: Vec<u8>,
 }
 
 #[derive(Clone, Copy)]
 pub struct Data<'a> {
-    data: &'a [u8],
+    page_index: &'a [u8],
+    pages: &'a [u8],
     strings: StringTable<'a>,
 }
 
 impl<'a> Data<'a> {
+    #[inline]
     pub fn get(self, codepoint: u32) -> Option<CharData<'a>> {
         let index = usize::try_from(codepoint).ok()?;
-        let start = index.checked_mul(DATA_ENTRY_SIZE)?;
-        let end = start.checked_add(DATA_ENTRY_SIZE)?;
-        let encoded = self.data.get(start..end)?;
-        let (name_index, category, ccc, _repeated) = decode_char_data(encoded.try_into().unwrap())?;
+        let page_number = index >> PAGE_BITS;
+        let page_index_start = page_number.checked_mul(PAGE_INDEX_ENTRY_SIZE)?;
+        let page_id = u16::from_le_bytes(
+            self.page_index
+                .get(page_index_start..(page_index_start + PAGE_INDEX_ENTRY_SIZE))?
+                .try_into()
+                .unwrap()
+        );
+        let start = usize::from(page_id) * PAGE_SIZE + (index & (PAGE_LEN - 1)) * DATA_ENTRY_SIZE;
+        let encoded = self.pages.get(start..(start + DATA_ENTRY_SIZE))?;
+        let (name_index, category, ccc) = decode_char_data(encoded.try_into().unwrap())?;
         let name = self.strings.get(name_index)?;
         Some(CharData::from_parts(name, category, ccc))
     }
 
-    pub fn to_bytes(self) -> Option<([u8; 4], [&'a [u8]; 2])> {
-        let strings = self.strings.to_bytes();
-        let strings_len = u32::try_from(strings.len())
-            .ok()?
-            .to_le_bytes();
-        Some((strings_len, [strings, self.data]))
-    }
-
     pub fn from_bytes(bytes: &'a [u8]) -> Option<Self> {
         let strings_len = usize::try_from(
             u32::from_le_bytes(bytes.get(..4)?.try_into().unwrap())
         ).ok()?;
-        let strings = StringTable::from_bytes(bytes.get(4..(4 + strings_len))?);
-        let data = bytes.get((4 + strings_len)..)?;
-        Some(Self { data, strings })
+        let strings_end = strings_len.checked_add(4)?;
+        let strings = StringTable::from_bytes(bytes.get(4..strings_end)?);
+        let page_index_end = strings_end.checked_add(PAGE_INDEX_SIZE)?;
+        let page_index = bytes.get(strings_end..page_index_end)?;
+        let pages = bytes.get(page_index_end..)?;
+        Some(Self { page_index, pages, strings })
     }
 }
 
@@ -188,6 +252,7 @@ impl<'a> StringTable<'a> {
         self.bytes
     }
 
+    #[inline]
     pub fn get(self, index: u32) -> Option<&'a str> {
         let index = usize::try_from(index).ok()?;
         let len = *self.bytes.get(index)?;
@@ -205,6 +270,10 @@ impl StringTableBuf {
         Self { buf: Vec::new() }
     }
 
+    pub fn with_capacity(capacity: usize) -> Self {
+        Self { buf: Vec::with_capacity(capacity) }
+    }
+
     pub fn as_ref_type(&self) -> StringTable {
         StringTable { bytes: &self.buf }
     }
@@ -213,14 +282,17 @@ impl StringTableBuf {
         let len = u8::try_from(s.len())
             .map_err(|_| StringTableBufError::StringTooLong)?;
 
+        // Data entries refer to strings by a 3-byte index, so the table can't grow past that.
         let index = u32::try_from(self.buf.len())
-            .map_err(|_| StringTableBufError::OutOfCapacity)?;
+            .ok()
+            .filter(|&index| index <= MAX_NAME_INDEX)
+            .ok_or(StringTableBufError::OutOfCapacity)?;
 
         self.buf.try_reserve(s.len() + 1)
             .map_err(|_| StringTableBufError::OutOfCapacity)?;
 
         self.buf.push(len);
-        self.buf.extend(s.bytes());
+        self.buf.extend_from_slice(s.as_bytes());
         
         Ok(index)
     }
@@ -243,3 +315,66 @@ impl fmt::Display for StringTableBufError {
 
 impl error::Error for StringTableBufError {}
 
+#[cfg(test)]
+mod tests {
+    use crate::chardata::{CharData, Category, CombiningClass};
+
+    use super::{Data, DataBuf, DataBufError};
+
+    #[test]
+    fn round_trip() {
+        let mut buf = DataBuf::new();
+
+        let chars = [
+            (0x41, "LATIN CAPITAL LETTER A", Category::Lu, 0),
+            (0xff, "LATIN SMALL LETTER Y WITH DIAERESIS", Category::Ll, 0),
+            (0x100, "LATIN CAPITAL LETTER A WITH MACRON", Category::Lu, 0),
+            (0x301, "COMBINING ACUTE ACCENT", Category::Mn, 230),
+        ];
+
+        for (codepoint, name, category, ccc) in chars {
+            let char_data = CharData::from_parts(name, category, CombiningClass(ccc));
+            buf.insert(char_data, codepoint..(codepoint + 1)).unwrap();
+        }
+
+        // A block spanning several pages, starting and ending partway through a page.
+        let block = CharData::from_parts("<CJK Ideograph Extension A>", Category::Lo, CombiningClass(0));
+        buf.insert(block, 0x3400..0x4dc0).unwrap();
+
+        let plane_16 = CharData::from_parts("<Plane 16 Private Use>", Category::Co, CombiningClass(0));
+        buf.insert(plane_16, 0x100000..0x10fffe).unwrap();
+
+        let parts = buf.to_bytes().unwrap();
+        let bytes = [&parts.strings_len[..], parts.strings, &parts.page_index, &parts.pages].concat();
+        let data = Data::from_bytes(&bytes).unwrap();
+
+        let get = |codepoint| data.get(codepoint)
+            .map(|c| (c.name(), c.category(), c.ccc().0));
+
+        for (codepoint, name, category, ccc) in chars {
+            assert_eq!(get(codepoint), Some((name, category, ccc)));
+        }
+
+        for codepoint in [0x3400, 0x34ff, 0x3500, 0x4dbf] {
+            assert_eq!(get(codepoint), Some(("<CJK Ideograph Extension A>", Category::Lo, 0)));
+        }
+
+        assert_eq!(get(0x10fffd), Some(("<Plane 16 Private Use>", Category::Co, 0)));
+
+        for codepoint in [0x0, 0x40, 0x42, 0x101, 0x33ff, 0x4dc0, 0xfffff, 0x10fffe, 0x10ffff] {
+            assert_eq!(get(codepoint), None);
+        }
+
+        for codepoint in [0x110000, 0x110100, u32::MAX] {
+            assert_eq!(get(codepoint), None);
+        }
+    }
+
+    #[test]
+    fn beyond_codepoint_space() {
+        let mut buf = DataBuf::new();
+        let char_data = CharData::from_parts("TOO BIG", Category::Cn, CombiningClass(0));
+        buf.insert(char_data, 0x110000..0x110001).unwrap();
+        assert!(matches!(buf.to_bytes(), Err(DataBufError::DataOutOfCapacity)));
+    }
+}